@@ -1,104 +1,330 @@
+import copy
+import hashlib
+import logging
 import os
 import json
+import threading
+from concurrent.futures import Future
 from typing import Dict, Any
 
+from cachetools import TTLCache
+
+import cache
+from climate import classify_climate
+
+logger = logging.getLogger(__name__)
+
+
+def _ai_redis_key(key: tuple) -> str:
+    """Stable fingerprint of the analysis inputs for the shared Redis cache.
+
+    The prompt is deterministic in (climate_label, city), so hashing that pair
+    identifies an analysis across processes and restarts.
+    """
+    return "ai:" + hashlib.blake2s(repr(key).encode()).hexdigest()
+
 try:
-    import openai
-except Exception:
-    openai = None
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from pydantic import BaseModel, ConfigDict
+
+    class _Section(BaseModel):
+        model_config = ConfigDict(str_strip_whitespace=True)
+
+        recommendation: str = ''
+        confidence: int = 50
+
+    class _AIOut(BaseModel):
+        irrigation_analysis: _Section = _Section()
+        pest_analysis: _Section = _Section()
+        field_analysis: _Section = _Section()
+        crop_analysis: _Section = _Section()
+except ImportError:
+    _AIOut = None
+
+
+def _parse_ai_json(text: str) -> Dict[str, Any]:
+    """Parse and normalize the model's JSON reply into the ai_analysis shape.
+
+    With pydantic available the whole payload is validated in one C-level pass
+    (parse, key defaults, str/int coercion); otherwise fall back to walking the
+    dict by hand.
+    """
+    if _AIOut is not None:
+        return _AIOut.model_validate_json(text).model_dump()
+
+    data = orjson.loads(text) if orjson else json.loads(text)
+
+    def _normalize(obj):
+        rec = obj.get('recommendation', '').strip()
+        conf = int(obj.get('confidence', 50)) if obj.get('confidence') is not None else 50
+        return {"recommendation": rec, "confidence": conf}
+
+    return {
+        "irrigation_analysis": _normalize(data.get('irrigation_analysis', {})),
+        "pest_analysis": _normalize(data.get('pest_analysis', {})),
+        "field_analysis": _normalize(data.get('field_analysis', {})),
+        "crop_analysis": _normalize(data.get('crop_analysis', {})),
+    }
+
+# Cache AI analyses per (climate_label, city) so repeated dashboard hits for the
+# same city don't re-call the remote LLM within the TTL window. _INFLIGHT holds
+# a future per key while a call is in progress so concurrent requests for the
+# same key share one upstream call (single-flight) instead of stampeding.
+_ANALYSIS_CACHE = TTLCache(maxsize=512, ttl=900)
+_ANALYSIS_CACHE_LOCK = threading.Lock()
+_INFLIGHT: Dict[tuple, Future] = {}
+
+
+# Whether to use the external API or built-in recommendations; read once at
+# import so the common fallback path is a single bool check.
+_USE_EXTERNAL_AI = os.getenv("USE_EXTERNAL_AI", "false").lower() == "true"
+_OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_KEY")
 
 
 def _get_openai_api_key() -> str:
-    # Check if we should use external API or built-in recommendations
-    use_external_api = os.getenv("USE_EXTERNAL_AI", "false").lower() == "true"
-    if not use_external_api:
+    if not _USE_EXTERNAL_AI:
         return None
-    return os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_KEY")
+    return _OPENAI_API_KEY
 
 
-def _get_mock_recommendations(climate_label: str, city: str = "") -> Dict[str, Any]:
-    """Generate realistic mock recommendations based on climate label for testing/demo purposes."""
-    climate = climate_label.lower()
-    
-    if 'rain' in climate or 'drizzle' in climate or 'thunderstorm' in climate:
-        return {
-            "irrigation_analysis": {
-                "recommendation": "Delay irrigation for 3-5 days. Check soil moisture at 4-6 inch depth before resuming watering schedule.",
-                "confidence": 92
-            },
-            "pest_analysis": {
-                "recommendation": "Apply fungicide preventively. Inspect for slug damage and use baits in problem areas. Increase scouting frequency during warm, humid periods.",
-                "confidence": 88
-            },
-            "field_analysis": {
-                "recommendation": "Avoid field operations until soil dries. Wait 24-48 hours after rain stops before using heavy machinery to prevent soil compaction.",
-                "confidence": 95
-            },
-            "crop_analysis": {
-                "recommendation": "Ensure proper drainage in low areas. Delay nitrogen application until drier conditions. Monitor for signs of waterlogging stress.",
-                "confidence": 90
-            }
+def is_external_ai_enabled() -> bool:
+    """True when analyses will actually call the external LLM API."""
+    return bool(_get_openai_api_key())
+
+
+# Mock recommendations are pure constants, so build them once at import time
+# instead of re-allocating the dict literals on every fallback call.
+MOCK_RECS: Dict[str, Dict[str, Any]] = {
+    "rain": {
+        "irrigation_analysis": {
+            "recommendation": "Delay irrigation for 3-5 days. Check soil moisture at 4-6 inch depth before resuming watering schedule.",
+            "confidence": 92
+        },
+        "pest_analysis": {
+            "recommendation": "Apply fungicide preventively. Inspect for slug damage and use baits in problem areas. Increase scouting frequency during warm, humid periods.",
+            "confidence": 88
+        },
+        "field_analysis": {
+            "recommendation": "Avoid field operations until soil dries. Wait 24-48 hours after rain stops before using heavy machinery to prevent soil compaction.",
+            "confidence": 95
+        },
+        "crop_analysis": {
+            "recommendation": "Ensure proper drainage in low areas. Delay nitrogen application until drier conditions. Monitor for signs of waterlogging stress.",
+            "confidence": 90
         }
-    elif 'winter' in climate or 'snow' in climate or 'cold' in climate:
-        return {
-            "irrigation_analysis": {
-                "recommendation": "Drain and winterize irrigation systems. Protect pipes from freezing. Only water if temperatures consistently above 40°F and soil is dry.",
-                "confidence": 95
-            },
-            "pest_analysis": {
-                "recommendation": "Inspect stored grain weekly. Remove crop residue to eliminate pest habitat. Apply dormant oil sprays on fruit trees if temperatures above 40°F.",
-                "confidence": 88
-            },
-            "field_analysis": {
-                "recommendation": "Suspend all field operations when ground is frozen or snow-covered. Cover sensitive equipment. Service machinery indoors during downtime.",
-                "confidence": 95
-            },
-            "crop_analysis": {
-                "recommendation": "Cover sensitive crops with row covers or mulch before freeze. Protect young trees with trunk wraps. Delay pruning until late winter.",
-                "confidence": 92
-            }
+    },
+    "winter": {
+        "irrigation_analysis": {
+            "recommendation": "Drain and winterize irrigation systems. Protect pipes from freezing. Only water if temperatures consistently above 40°F and soil is dry.",
+            "confidence": 95
+        },
+        "pest_analysis": {
+            "recommendation": "Inspect stored grain weekly. Remove crop residue to eliminate pest habitat. Apply dormant oil sprays on fruit trees if temperatures above 40°F.",
+            "confidence": 88
+        },
+        "field_analysis": {
+            "recommendation": "Suspend all field operations when ground is frozen or snow-covered. Cover sensitive equipment. Service machinery indoors during downtime.",
+            "confidence": 95
+        },
+        "crop_analysis": {
+            "recommendation": "Cover sensitive crops with row covers or mulch before freeze. Protect young trees with trunk wraps. Delay pruning until late winter.",
+            "confidence": 92
         }
-    elif 'sunny' in climate or 'clear' in climate:
-        return {
-            "irrigation_analysis": {
-                "recommendation": "Increase watering frequency. Irrigate early morning (4-8 AM) or evening to minimize evaporation. Apply 1-1.5 inches per week for most crops.",
-                "confidence": 92
-            },
-            "pest_analysis": {
-                "recommendation": "Scout for spider mites and aphids twice weekly. Apply insecticidal soap early if pest threshold reached. Maintain beneficial insect habitat with cover crops.",
-                "confidence": 88
-            },
-            "field_analysis": {
-                "recommendation": "Complete spraying, harvesting and planting operations now. Schedule work before 10 AM or after 4 PM. Provide shade and water breaks for workers.",
-                "confidence": 95
-            },
-            "crop_analysis": {
-                "recommendation": "Apply shade cloth for heat-sensitive crops. Increase mulch depth to 3-4 inches. Monitor for wilting and apply supplemental water as needed.",
-                "confidence": 90
-            }
+    },
+    "sunny": {
+        "irrigation_analysis": {
+            "recommendation": "Increase watering frequency. Irrigate early morning (4-8 AM) or evening to minimize evaporation. Apply 1-1.5 inches per week for most crops.",
+            "confidence": 92
+        },
+        "pest_analysis": {
+            "recommendation": "Scout for spider mites and aphids twice weekly. Apply insecticidal soap early if pest threshold reached. Maintain beneficial insect habitat with cover crops.",
+            "confidence": 88
+        },
+        "field_analysis": {
+            "recommendation": "Complete spraying, harvesting and planting operations now. Schedule work before 10 AM or after 4 PM. Provide shade and water breaks for workers.",
+            "confidence": 95
+        },
+        "crop_analysis": {
+            "recommendation": "Apply shade cloth for heat-sensitive crops. Increase mulch depth to 3-4 inches. Monitor for wilting and apply supplemental water as needed.",
+            "confidence": 90
         }
-    else:
-        return {
-            "irrigation_analysis": {
-                "recommendation": "Water when top 2 inches of soil is dry. Apply 0.75-1 inch per week. Install moisture sensors for precise scheduling.",
-                "confidence": 85
-            },
-            "pest_analysis": {
-                "recommendation": "Scout fields twice weekly. Set up yellow sticky traps to monitor pest populations. Apply treatments only when thresholds are exceeded.",
-                "confidence": 82
-            },
-            "field_analysis": {
-                "recommendation": "Proceed with planned field operations. Check 3-day forecast before critical activities. Avoid spraying if rain expected within 24 hours.",
-                "confidence": 88
-            },
-            "crop_analysis": {
-                "recommendation": "Apply balanced fertilizer based on soil test results. Monitor crop growth stage weekly. Adjust nitrogen rates according to leaf color and vigor.",
-                "confidence": 85
-            }
+    },
+    "default": {
+        "irrigation_analysis": {
+            "recommendation": "Water when top 2 inches of soil is dry. Apply 0.75-1 inch per week. Install moisture sensors for precise scheduling.",
+            "confidence": 85
+        },
+        "pest_analysis": {
+            "recommendation": "Scout fields twice weekly. Set up yellow sticky traps to monitor pest populations. Apply treatments only when thresholds are exceeded.",
+            "confidence": 82
+        },
+        "field_analysis": {
+            "recommendation": "Proceed with planned field operations. Check 3-day forecast before critical activities. Avoid spraying if rain expected within 24 hours.",
+            "confidence": 88
+        },
+        "crop_analysis": {
+            "recommendation": "Apply balanced fertilizer based on soil test results. Monitor crop growth stage weekly. Adjust nitrogen rates according to leaf color and vigor.",
+            "confidence": 85
         }
+    },
+}
+
+def _get_mock_recommendations(climate_label: str, city: str = "") -> Dict[str, Any]:
+    """Return realistic mock recommendations based on climate label for testing/demo purposes."""
+    return MOCK_RECS[classify_climate(climate_label)]
+
+
+# Prompt constants: the system prompt never changes and the user prompt only
+# interpolates two values, so build them once at import instead of
+# reconstructing ~1KB of text per AI call. Strict JSON output is enforced via
+# response_format below.
+_SYSTEM_PROMPT = (
+    "You are an expert agricultural advisor. Given a short climate label like 'rain', 'winter', or 'sunny', "
+    "produce concise, practical precautionary recommendations for farmers in JSON format. "
+    "Return a JSON object with keys: irrigation_analysis, pest_analysis, field_analysis, crop_analysis. "
+    "Each value must be an object with 'recommendation' (short text) and 'confidence' (integer 0-100). "
+    "Do not include any extra commentary outside the JSON."
+)
+
+_USER_PROMPT_TMPL = (
+    "City: {city}\nClimate label: {climate_label}\n\n"
+    "Provide recommendations focused on practical farm actions (watering, covering crops, delaying operations, pest scouting, etc.)."
+)
+
+
+def _chat_request_kwargs(climate_label: str, city: str) -> Dict[str, Any]:
+    """Build the chat-completion kwargs shared by the sync and async clients."""
+    return dict(
+        model="deepseek-chat",  # DeepSeek's main model
+        messages=[
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": _USER_PROMPT_TMPL.format(city=city, climate_label=climate_label)},
+        ],
+        temperature=0.2,
+        max_tokens=400,
+        stream=True,
+        response_format={"type": "json_object"},
+    )
+
+
+def _parse_ai_text(text: str) -> Dict[str, Any]:
+    """Parse the model's reply. response_format guarantees a bare JSON object,
+    so parse directly; fence-stripping survives only as a fallback for models
+    that wrap the payload in markdown anyway.
+    """
+    try:
+        return _parse_ai_json(text)
+    except ValueError:
+        if text.startswith('```'):
+            for part in text.split('```'):
+                part = part.strip()
+                if part.startswith('{'):
+                    text = part
+                    break
+        return _parse_ai_json(text)
 
 
 def generate_ai_analysis(climate_label: str, city: str = "") -> Dict[str, Any]:
+    """
+    Cached wrapper around the AI analysis call. Keyed by (climate_label, city) so
+    repeated requests for the same city within the TTL skip the network round trip,
+    and concurrent requests for the same key coalesce into one upstream call.
+    Returns a deep copy so callers can mutate the result without poisoning the cache.
+    """
+    key = (climate_label.lower(), city.lower())
+    with _ANALYSIS_CACHE_LOCK:
+        cached = _ANALYSIS_CACHE.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        future = _INFLIGHT.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _INFLIGHT[key] = future
+
+    if not owner:
+        # Another thread is already making this call; wait for its result
+        return copy.deepcopy(future.result())
+
+    try:
+        result = _shared_cache_get(key)
+        if result is None:
+            result = _generate_ai_analysis(climate_label, city)
+            _shared_cache_put(key, result)
+    except BaseException as exc:
+        with _ANALYSIS_CACHE_LOCK:
+            _INFLIGHT.pop(key, None)
+        future.set_exception(exc)
+        raise
+
+    with _ANALYSIS_CACHE_LOCK:
+        _ANALYSIS_CACHE[key] = result
+        _INFLIGHT.pop(key, None)
+    future.set_result(result)
+    return copy.deepcopy(result)
+
+
+def peek_ai_analysis(climate_label: str, city: str = ""):
+    """Non-blocking lookup: return a finished analysis, or None without ever
+    calling the model. Lets the dashboard render immediately and poll for the
+    real result instead of holding the HTTP response open for the LLM.
+    """
+    key = (climate_label.lower(), city.lower())
+    with _ANALYSIS_CACHE_LOCK:
+        cached = _ANALYSIS_CACHE.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    result = _shared_cache_get(key)
+    if result is not None:
+        with _ANALYSIS_CACHE_LOCK:
+            _ANALYSIS_CACHE[key] = result
+        return copy.deepcopy(result)
+    return None
+
+
+def start_ai_analysis(climate_label: str, city: str = "") -> None:
+    """Kick off generate_ai_analysis on a daemon thread without waiting for it.
+
+    The single-flight future inside generate_ai_analysis dedupes concurrent
+    kicks for the same key, so calling this on every cache miss is safe.
+    """
+    threading.Thread(
+        target=generate_ai_analysis, args=(climate_label, city), daemon=True
+    ).start()
+
+
+def fallback_analysis(climate_label: str) -> Dict[str, Any]:
+    """Instant local analysis (no network) — shown while the real one runs."""
+    return copy.deepcopy(_get_mock_recommendations(climate_label))
+
+
+def _shared_cache_get(key: tuple):
+    """Look up an analysis in the cross-process Redis cache.
+
+    Only consulted when the external API is on — fallback analyses are cheap
+    to rebuild locally. Hit/miss counters make TTL tuning observable.
+    """
+    if not is_external_ai_enabled():
+        return None
+    result = cache.get_json(_ai_redis_key(key))
+    cache.incr("ai:hits" if result is not None else "ai:miss")
+    return result
+
+
+def _shared_cache_put(key: tuple, result: Dict[str, Any]) -> None:
+    if not is_external_ai_enabled():
+        return
+    # Multi-hour TTL: the analysis for a climate label changes far more
+    # slowly than the weather that produced it
+    cache.set_json(_ai_redis_key(key), result, ttl=3600)
+
+
+def _generate_ai_analysis(climate_label: str, city: str = "") -> Dict[str, Any]:
     """
     Call OpenAI to generate agricultural precaution recommendations for several categories
     based on a simple climate label (e.g. 'rain', 'winter', 'sunny'). Returns a dictionary
@@ -110,101 +336,109 @@ def generate_ai_analysis(climate_label: str, city: str = "") -> Dict[str, Any]:
 
     If OpenAI is not available or API key is missing, returns sensible fallback text.
     """
-    fallback = _get_mock_recommendations(climate_label, city)  # Use mock recommendations as fallback
-
     api_key = _get_openai_api_key()
-    if not api_key or openai is None:
-        return fallback
+    if not api_key:
+        # Common case: external AI disabled — a shared mock dict lookup away
+        return _get_mock_recommendations(climate_label, city)
 
-    # Use the new OpenAI client API (v1.0+)
-    # DeepSeek API is OpenAI-compatible, just needs different base_url
+    fallback = _get_mock_recommendations(climate_label, city)  # Use mock recommendations as fallback
+
+    # Lazy-import openai only when an API call will actually happen; the
+    # package (plus its httpx/pydantic deps) is too expensive to pull in at
+    # module load when USE_EXTERNAL_AI is off.
     try:
         from openai import OpenAI
-        # Check if using DeepSeek API key (starts with 'sk-' but use DeepSeek endpoint)
-        if api_key:
-            client = OpenAI(
-                api_key=api_key,
-                base_url="https://api.deepseek.com"
-            )
-        else:
-            client = OpenAI(api_key=api_key)
     except ImportError:
-        # Fallback to old API style
-        openai.api_key = api_key
-        client = None
-
-    # Construct a concise prompt that asks the model to return strict JSON for parsing
-    system_prompt = (
-        "You are an expert agricultural advisor. Given a short climate label like 'rain', 'winter', or 'sunny', "
-        "produce concise, practical precautionary recommendations for farmers in JSON format. "
-        "Return a JSON object with keys: irrigation_analysis, pest_analysis, field_analysis, crop_analysis. "
-        "Each value must be an object with 'recommendation' (short text) and 'confidence' (integer 0-100). "
-        "Do not include any extra commentary outside the JSON."
-    )
+        return fallback
 
-    user_prompt = (
-        f"City: {city}\nClimate label: {climate_label}\n\n"
-        "Provide recommendations focused on practical farm actions (watering, covering crops, delaying operations, pest scouting, etc.)."
+    # DeepSeek API is OpenAI-compatible, just needs different base_url
+    client = OpenAI(
+        api_key=api_key,
+        base_url="https://api.deepseek.com"
     )
 
     try:
-        if client:
-            # New API (v1.0+) - works with both OpenAI and DeepSeek
-            response = client.chat.completions.create(
-                model="deepseek-chat",  # DeepSeek's main model
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.2,
-                max_tokens=400,
-            )
-            text = response.choices[0].message.content.strip()
-        else:
-            # Old API (legacy)
-            response = openai.ChatCompletion.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.2,
-                max_tokens=400,
-            )
-            text = response.choices[0].message.content.strip()
-
-        # Ensure we have JSON only — try to parse the returned text
-        # Some models include backticks or markdown, strip common wrappers
-        if text.startswith('```'):
-            # remove triple backtick code fences
-            parts = text.split('```')
-            # typical response: ```json\n{...}\n```
-            # find the part that looks like JSON
-            for part in parts:
-                part = part.strip()
-                if part.startswith('{'):
-                    text = part
-                    break
+        # Stream the completion and stop reading once the top-level JSON
+        # object closes, so we don't wait on trailing whitespace/markdown
+        # the model may keep generating after the payload.
+        response = client.chat.completions.create(**_chat_request_kwargs(climate_label, city))
+        chunks = []
+        depth = 0
+        seen_open = False
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content or ''
+            chunks.append(token)
+            depth += token.count('{') - token.count('}')
+            seen_open = seen_open or '{' in token
+            if seen_open and depth == 0:
+                break
+        return _parse_ai_text(''.join(chunks).strip())
+
+    except Exception as e:
+        # One-line warning instead of a full traceback: formatting the whole
+        # stack on every failure gets expensive during an API outage, when
+        # every request lands here
+        logger.warning("AI call failed, using fallback: %s: %s", type(e).__name__, e)
+        return fallback
 
-        data = json.loads(text)
 
-        # Normalize values and ensure the shape
-        def _normalize(obj):
-            rec = obj.get('recommendation', '').strip()
-            conf = int(obj.get('confidence', 50)) if obj.get('confidence') is not None else 50
-            return {"recommendation": rec, "confidence": conf}
+async def generate_ai_analysis_async(climate_label: str, city: str = "") -> Dict[str, Any]:
+    """Async counterpart of generate_ai_analysis for callers already on an
+    event loop. Shares the same TTL cache; the API call itself goes through
+    openai's AsyncOpenAI client so no worker thread is tied up while the
+    model responds.
+    """
+    key = (climate_label.lower(), city.lower())
+    with _ANALYSIS_CACHE_LOCK:
+        cached = _ANALYSIS_CACHE.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
 
-        ai_out = {
-            "irrigation_analysis": _normalize(data.get('irrigation_analysis', {})),
-            "pest_analysis": _normalize(data.get('pest_analysis', {})),
-            "field_analysis": _normalize(data.get('field_analysis', {})),
-            "crop_analysis": _normalize(data.get('crop_analysis', {})),
-        }
-        return ai_out
+    result = _shared_cache_get(key)
+    if result is None:
+        result = await _generate_ai_analysis_async(climate_label, city)
+        _shared_cache_put(key, result)
+    with _ANALYSIS_CACHE_LOCK:
+        _ANALYSIS_CACHE[key] = result
+    return copy.deepcopy(result)
+
+
+async def _generate_ai_analysis_async(climate_label: str, city: str = "") -> Dict[str, Any]:
+    api_key = _get_openai_api_key()
+    if not api_key:
+        return _get_mock_recommendations(climate_label, city)
+
+    fallback = _get_mock_recommendations(climate_label, city)
+
+    try:
+        from openai import AsyncOpenAI
+    except ImportError:
+        return fallback
+
+    client = AsyncOpenAI(
+        api_key=api_key,
+        base_url="https://api.deepseek.com"
+    )
+
+    try:
+        # Same streaming early-stop as the sync path, just on the async client
+        response = await client.chat.completions.create(**_chat_request_kwargs(climate_label, city))
+        chunks = []
+        depth = 0
+        seen_open = False
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content or ''
+            chunks.append(token)
+            depth += token.count('{') - token.count('}')
+            seen_open = seen_open or '{' in token
+            if seen_open and depth == 0:
+                break
+        return _parse_ai_text(''.join(chunks).strip())
 
     except Exception as e:
-        # On any error parsing or calling the API return fallback with low confidence
-        print(f"AI Client Error: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("AI call failed, using fallback: %s: %s", type(e).__name__, e)
         return fallback
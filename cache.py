@@ -0,0 +1,54 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Version prefix namespaces every key, so a deploy that changes cached shapes
+# can invalidate everything atomically by bumping it.
+_VERSION = "v1"
+
+try:
+    import redis as _redis
+except ImportError:
+    _redis = None
+
+# Redis is optional: without REDIS_URL (or the redis package) every helper is
+# a no-op and the in-process TTL caches carry the load alone. With it, cache
+# entries are shared across waitress processes/replicas.
+_client = None
+_redis_url = os.getenv("REDIS_URL")
+if _redis is not None and _redis_url:
+    _client = _redis.Redis.from_url(_redis_url, decode_responses=True)
+
+
+def get_json(key):
+    """Fetch a cached JSON value; None on miss, no Redis, or Redis errors."""
+    if _client is None:
+        return None
+    try:
+        value = _client.get(f"{_VERSION}:{key}")
+    except Exception as e:
+        logger.warning("Redis get failed for %s: %s", key, e)
+        return None
+    return json.loads(value) if value else None
+
+
+def set_json(key, value, ttl):
+    """Store a JSON-serializable value with a TTL; silently skipped without Redis."""
+    if _client is None:
+        return
+    try:
+        _client.setex(f"{_VERSION}:{key}", ttl, json.dumps(value))
+    except Exception as e:
+        logger.warning("Redis set failed for %s: %s", key, e)
+
+
+def incr(key):
+    """Bump a counter (e.g. hit/miss metrics); silently skipped without Redis."""
+    if _client is None:
+        return
+    try:
+        _client.incr(f"{_VERSION}:{key}")
+    except Exception as e:
+        logger.warning("Redis incr failed for %s: %s", key, e)
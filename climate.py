@@ -0,0 +1,16 @@
+import re
+
+# One precompiled scan replaces the chains of `'rain' in label or ...` checks
+# that used to live in both ai_client and server. The matching group name
+# doubles as the recommendation key.
+CLIMATE_RE = re.compile(
+    r'(?P<rain>rain|drizzle|thunderstorm)'
+    r'|(?P<winter>winter|snow|cold)'
+    r'|(?P<sunny>sun|clear)',
+    re.IGNORECASE,
+)
+
+def classify_climate(label):
+    """Map a free-form climate label to 'rain', 'winter', 'sunny' or 'default'."""
+    match = CLIMATE_RE.search(label)
+    return match.lastgroup if match else 'default'
@@ -1,13 +1,42 @@
 import requests
+import threading
+from cachetools import TTLCache, cached
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 import os
 from pprint import pprint
 
 load_dotenv()
 
+# Read once at import instead of hitting os.environ on every call
+API_KEY = os.getenv("API_KEY")
+
+# Endpoint constant; the query string is built by requests from params=,
+# which also takes care of percent-encoding city names
+_WEATHER_URL = 'https://api.openweathermap.org/data/2.5/weather'
+
+# One shared session keeps the TLS connection to api.openweathermap.org warm
+# across calls instead of paying a fresh TCP+TLS handshake every time.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.2,
+                      status_forcelist=[502, 503, 504], allowed_methods=["GET"]),
+))
+SESSION.headers["Accept-Encoding"] = "gzip"
+
+# (connect, read) timeouts: give up on an unreachable host in 2s instead of
+# holding a waitress worker for the full read timeout
+_TIMEOUT = (2, 5)
+
+# Conditions barely change within 10 minutes; cache per city to avoid
+# re-querying OpenWeatherMap on every hit (thread-safe under waitress).
+@cached(TTLCache(maxsize=1024, ttl=600), lock=threading.RLock())
 def get_current_weather(city="Kansas City"):
-    request_url = f'https://api.openweathermap.org/data/2.5/weather?appid={os.getenv("API_KEY")}&q={city}&units=imperial'
-    weather_data = requests.get(request_url).json()
+    weather_data = SESSION.get(_WEATHER_URL, params={
+        'appid': API_KEY, 'q': city, 'units': 'imperial'}, timeout=_TIMEOUT).json()
     return weather_data
 
 if __name__ == "__main__":
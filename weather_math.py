@@ -0,0 +1,45 @@
+import numpy as np
+
+# Numba is optional: without it the functions below run as plain NumPy, which
+# is already vectorized — the JIT just fuses the loops and removes temporaries
+# for large batch inputs (many days or many cities). cache=True persists the
+# compiled artifacts so startup doesn't pay the compile cost on every boot.
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        def wrap(fn):
+            return fn
+        return wrap
+
+
+@njit(cache=True, fastmath=True)
+def gdd_array(temp_max, temp_min, base_temp=50.0):
+    """Growing Degree Days for aligned temp arrays."""
+    return np.maximum(0.0, (temp_max + temp_min) * 0.5 - base_temp)
+
+
+@njit(cache=True)
+def frost_risk_codes(temp_min, humidity):
+    """Frost-risk severity codes (0=Low, 1=Moderate, 2=High) per element."""
+    out = np.zeros(temp_min.shape[0], dtype=np.int8)
+    for i in range(temp_min.shape[0]):
+        if temp_min[i] <= 32 and humidity[i] > 80:
+            out[i] = 2
+        elif temp_min[i] <= 36:
+            out[i] = 1
+    return out
+
+
+@njit(cache=True)
+def irrigation_codes(humidity, precipitation, temp):
+    """Irrigation-need codes (0=Low, 1=Medium, 2=High) per element."""
+    out = np.zeros(humidity.shape[0], dtype=np.int8)
+    for i in range(humidity.shape[0]):
+        if precipitation[i] > 0.5:
+            out[i] = 0
+        elif humidity[i] < 40 and temp[i] > 80:
+            out[i] = 2
+        elif humidity[i] < 60:
+            out[i] = 1
+    return out